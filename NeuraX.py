@@ -1,7 +1,46 @@
 import os
+import atexit
+import queue
+import sqlite3
+import re
+import json
+import gzip
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, asdict
+from concurrent.futures import Future, ThreadPoolExecutor
+import httpx
 from openai import OpenAI
 import tiktoken
-from flask import Flask, render_template_string, request, jsonify
+from flask import Flask, Response, request, jsonify
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:
+    # orjson is optional; the stdlib json module is used when it isn't installed
+    orjson = None
+
+try:
+    import fcntl
+except ImportError:
+    # fcntl is POSIX-only; without it the session log can't guard against a second process
+    fcntl = None
+
+try:
+    import brotli
+except ImportError:
+    # brotli is optional; without it the home page is only offered gzip-compressed
+    brotli = None
+
+try:
+    import h2  # noqa: F401 (only needed by httpx's HTTP/2 support)
+    http2_available = True
+except ImportError:
+    # h2 is optional; without it the OpenAI client speaks HTTP/1.1
+    http2_available = False
 
 # Get API key from environment variables
 api_key = os.getenv("AI_API_KEY")
@@ -10,196 +49,862 @@ if not api_key:
     # For this canvas, we will proceed assuming the key is handled externally if needed.
     pass
 
-# Initialize OpenAI client (If api_key is None, it might use other default auth methods or fail later)
-client = OpenAI(api_key=api_key if api_key else "placeholder_key")
+# Shared HTTP connection pool for the OpenAI client. The httpx default (10 connections)
+# raises PoolTimeout when several Flask threads hit /api/chat at once. Each gunicorn worker
+# has its own client, so the pool is sized to the per-worker connection count (gunicorn.conf.py).
+max_connections = int(os.getenv("WORKER_CONNECTIONS", "200"))
+# With HTTP/2, concurrent calls (e.g. a reply and a background title) share one TLS connection
+http_client = httpx.Client(
+    http2=http2_available,
+    limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections // 2),
+    timeout=httpx.Timeout(60.0, connect=5.0)
+)
+
+# Initialize OpenAI client once and reuse it for every request
+# (If api_key is None, it might use other default auth methods or fail later)
+# max_retries: the SDK retries 429s, 5xx and connection errors with exponential backoff + jitter
+client = OpenAI(api_key=api_key if api_key else "placeholder_key", http_client=http_client, max_retries=5)
+
+class RateLimiter:
+    """Thread-safe token bucket that paces OpenAI calls under a requests/minute and tokens/minute budget."""
+
+    def __init__(self, requests_per_minute, tokens_per_minute):
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self.available_requests = requests_per_minute
+        self.available_tokens = tokens_per_minute
+        self.last_update = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self, tokens):
+        """Blocks until there is capacity for one request consuming the given number of tokens."""
+        # A single request can never need more than a full bucket
+        tokens = min(tokens, self.tokens_per_minute)
+        while True:
+            with self.lock:
+                # Refill both buckets for the time elapsed since the last call
+                now = time.monotonic()
+                elapsed = now - self.last_update
+                self.last_update = now
+                self.available_requests = min(self.requests_per_minute, self.available_requests + elapsed * self.requests_per_minute / 60)
+                self.available_tokens = min(self.tokens_per_minute, self.available_tokens + elapsed * self.tokens_per_minute / 60)
+
+                if self.available_requests >= 1 and self.available_tokens >= tokens:
+                    self.available_requests -= 1
+                    self.available_tokens -= tokens
+                    return
+
+                # Sleep just long enough for the scarcer bucket to refill
+                wait = max((1 - self.available_requests) * 60 / self.requests_per_minute,
+                           (tokens - self.available_tokens) * 60 / self.tokens_per_minute)
+            time.sleep(wait)
+
+# Proactive pacing so spikes queue briefly instead of triggering 429 retry storms (limits are per worker process)
+rate_limiter = RateLimiter(
+    requests_per_minute=int(os.getenv("OPENAI_RPM", "3500")),
+    tokens_per_minute=int(os.getenv("OPENAI_TPM", "90000"))
+)
+
+class OrjsonProvider(DefaultJSONProvider):
+    """Flask JSON provider backed by orjson, used by jsonify() and request.json."""
+
+    def dumps(self, obj, **kwargs):
+        return orjson.dumps(obj).decode('utf-8')
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        # orjson already returns bytes, so skip the str round-trip the default provider does
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(orjson.dumps(obj), mimetype=self.mimetype)
 
 # Initialize Flask app
 app = Flask(__name__)
+if orjson is not None:
+    app.json = OrjsonProvider(app)
+
+# Shared worker pool for OpenAI calls that run off the request path (e.g. title generation)
+executor = ThreadPoolExecutor(max_workers=8)
+# Title requests in flight, by message digest; concurrent identical requests wait on the same Future
+title_requests = {}
+# Recently generated titles by message digest, least recently used first; common openers ("hi") hit often
+title_cache = OrderedDict()
+TITLE_CACHE_SIZE = 1024
+title_requests_lock = threading.Lock()
+
+class SessionStore:
+    """Thread-safe LRU map of session ID -> JSON blob that spills the least recently written sessions to SQLite."""
+
+    def __init__(self, max_resident, db_path="", log=None):
+        self.max_resident = max_resident
+        # Optional SessionLog that every write and delete is recorded to
+        self.log = log
+        # Hot sessions, least recently written first
+        self.resident = OrderedDict()
+        # Cold sessions; rowid order is eviction order, i.e. still least recently written first
+        # Autocommit: each spill insert/delete is its own statement and must not sit in an open transaction
+        self.db = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None)
+        self.db.execute("CREATE TABLE IF NOT EXISTS spilled (session_id TEXT PRIMARY KEY, history BLOB NOT NULL)")
+        self.lock = threading.RLock()
+
+    def __contains__(self, session_id):
+        with self.lock:
+            return session_id in self.resident or self._read_spilled(session_id) is not None
+
+    def get(self, session_id, default=None):
+        # Reads don't change the order, so spilled sessions are served from SQLite until written again
+        with self.lock:
+            blob = self.resident.get(session_id)
+            if blob is None:
+                blob = self._read_spilled(session_id)
+            return default if blob is None else blob
+
+    def __setitem__(self, session_id, blob):
+        with self.lock:
+            self.db.execute("DELETE FROM spilled WHERE session_id = ?", (session_id,))
+            self.resident[session_id] = blob
+            self.resident.move_to_end(session_id)
+            if self.log is not None:
+                self.log.record_save(session_id, blob)
+            # Spill the coldest sessions instead of dropping them
+            while len(self.resident) > self.max_resident:
+                self.db.execute("INSERT OR REPLACE INTO spilled VALUES (?, ?)", self.resident.popitem(last=False))
+
+    def pop(self, session_id):
+        with self.lock:
+            blob = self.get(session_id)
+            if blob is None:
+                raise KeyError(session_id)
+            del self[session_id]
+            return blob
+
+    def __delitem__(self, session_id):
+        with self.lock:
+            self.resident.pop(session_id, None)
+            self.db.execute("DELETE FROM spilled WHERE session_id = ?", (session_id,))
+            if self.log is not None:
+                self.log.record_delete(session_id)
+
+    def keys(self):
+        """Returns every session ID, least recently written first."""
+        with self.lock:
+            spilled = [row[0] for row in self.db.execute("SELECT session_id FROM spilled ORDER BY rowid")]
+            return spilled + list(self.resident)
+
+    def _read_spilled(self, session_id):
+        row = self.db.execute("SELECT history FROM spilled WHERE session_id = ?", (session_id,)).fetchone()
+        return row[0] if row else None
+
+class SessionLog:
+    """Append-only JSONL log of session writes and deletes, written by a background thread.
+
+    Each line is {"sid": ..., "h": [...]} for a write or {"sid": ..., "h": null} for a delete;
+    replaying the lines in order rebuilds the sessions after a restart. Every write appends the
+    session's whole history, so the log is compacted to one line per session at startup and
+    whenever it grows past max_bytes.
+    """
+
+    def __init__(self, path, max_bytes):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.store = None
+        self.queue = queue.Queue()
+        self.thread = threading.Thread(target=self._write_loop, name="session-log", daemon=True)
+
+    def lock(self, timeout):
+        """Takes an exclusive lock on the log for this process, waiting up to timeout seconds for another process to release it.
+
+        Returns False if it is still held after that.
+        """
+        # A separate lock file, because compaction replaces the log file itself
+        self.lock_file = open(self.path + ".lock", "ab")
+        if fcntl is None:
+            return True  # No advisory locks on this platform; run a single process
+        # Polled rather than blocking, so the wait is bounded and a gevent worker's hub isn't stalled
+        deadline = time.monotonic() + timeout
+        while True:
+            try:
+                fcntl.flock(self.lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                return True
+            except OSError:
+                if time.monotonic() >= deadline:
+                    self.lock_file.close()
+                    return False
+                time.sleep(0.1)
+
+    def record_save(self, session_id, blob):
+        # The blob is already JSON, so splice it into the line instead of re-encoding it
+        self.queue.put(b'{"sid":' + dumps_json(session_id) + b',"h":' + blob + b'}\n')
+
+    def record_delete(self, session_id):
+        self.queue.put(b'{"sid":' + dumps_json(session_id) + b',"h":null}\n')
+
+    def replay(self, store):
+        """Applies the log to store, then compacts it; store is also what later compactions snapshot."""
+        if os.path.exists(self.path):
+            with open(self.path, "rb") as f:
+                for line in f:
+                    try:
+                        entry = loads_json(line)
+                    except ValueError:
+                        continue  # A line torn by a crash mid-write
+                    if entry["h"] is None:
+                        del store[entry["sid"]]
+                    else:
+                        store[entry["sid"]] = dumps_json(entry["h"])
+        self.store = store
+        self.compact()
+
+    def compact(self):
+        """Rewrites the log as one line per session currently in the store."""
+        # Lines still queued are appended afterwards; replaying them again is harmless
+        with self.store.lock:
+            snapshot = [(session_id, self.store.get(session_id)) for session_id in self.store.keys()]
+        compacted_path = self.path + ".tmp"
+        with open(compacted_path, "wb") as f:
+            for session_id, blob in snapshot:
+                f.write(b'{"sid":' + dumps_json(session_id) + b',"h":' + blob + b'}\n')
+        os.replace(compacted_path, self.path)
+
+    def start(self):
+        """Starts the writer thread; writes queued from now on are appended to the log."""
+        self.file = open(self.path, "ab")
+        self.thread.start()
+        # Flush whatever is still queued on a clean shutdown
+        atexit.register(self.close)
+
+    def close(self):
+        self.queue.put(None)
+        self.thread.join(timeout=5)
+
+    def _write_loop(self):
+        while True:
+            lines = [self.queue.get()]
+            # Write everything queued so far in one go. No fsync: under gevent this "thread" is a
+            # greenlet, and fsync would stall every request in the worker. Flushed lines survive a
+            # process crash, just not an OS crash
+            while not self.queue.empty():
+                lines.append(self.queue.get_nowait())
+            self.file.write(b"".join(line for line in lines if line is not None))
+            self.file.flush()
+            if None in lines:
+                self.file.close()
+                return
+            if self.file.tell() > self.max_bytes:
+                self.file.close()
+                self.compact()
+                self.file = open(self.path, "ab")
 
 # --- In-memory session storage (for this example) ---
-# Stores chat history: {session_id: [{"role": "user", "content": "..."}, ...]}
-chat_sessions = {}
+# Stores chat history as a UTF-8 JSON blob per session, least recently written first:
+# {session_id: b'[{"role":"user","content":"..."}, ...]'}
+# Oldest sessions are spilled to SQLite once this many are held in memory
+MAX_SESSIONS = 1000
+# "" is a private temporary database that SQLite deletes on exit; set a path to inspect it
+chat_sessions = SessionStore(MAX_SESSIONS, os.getenv("SESSIONS_SPILL_DB", ""))
+# Set SESSIONS_LOG to a file path (e.g. sessions.jsonl) to keep sessions across restarts through a
+# write-behind log, replayed at startup. Off by default: the log holds every user's full chat text
+SESSIONS_LOG = os.getenv("SESSIONS_LOG", "")
+# The log is compacted once it grows past this size
+SESSIONS_LOG_MAX_BYTES = int(os.getenv("SESSIONS_LOG_MAX_BYTES", str(64 * 1024 * 1024)))
+# How long a starting process waits for the previous owner of the log to exit; longer than gunicorn's
+# graceful_timeout (30s by default), so a reload's new worker outlasts the old one's shutdown flush
+SESSIONS_LOG_LOCK_TIMEOUT = float(os.getenv("SESSIONS_LOG_LOCK_TIMEOUT", "45"))
 session_counter = 0
+# Provisional session IDs renamed in the background, least recently added first: {old_id: new_id}
+# Every alias points at a live session; entries go when their session is deleted or their old ID is reused
+session_aliases = OrderedDict()
+SESSION_ALIASES_SIZE = 1024
+# Running summaries of each session's oldest turns: {session_id: (messages_covered, summary)}
+session_summaries = {}
+# Sessions with a summary job queued or running
+summarizing = set()
+# Next free numeric suffix per base name, so allocating a unique name is O(1): {base_name: n}
+name_suffixes = {}
+# Bumped on every change to chat_sessions; the /api/get_sessions ETag is derived from it
+sessions_version = 0
+# Distinguishes ETags across restarts, when sessions_version starts again from 0
+SESSIONS_ETAG_PREFIX = os.urandom(4).hex()
+# Guards chat_sessions/session_aliases/name_suffixes against the request threads and background renames
+sessions_lock = threading.RLock()
+
+MODEL = "gpt-3.5-turbo"
+
+# Tokenizer is loaded once at import, so the model->encoding lookup never runs per request
+try:
+    _ENCODING = tiktoken.encoding_for_model(MODEL)
+except KeyError:
+    # Model unknown to this tiktoken version; every current chat model uses cl100k_base
+    _ENCODING = tiktoken.get_encoding("cl100k_base")
+# Prompt budget for the history sent to OpenAI (gpt-3.5-turbo has a 4k window; leave room for the reply)
+MAX_CONTEXT_TOKENS = 3500
+# Below this much text, count_tokens encodes in a plain loop instead of tiktoken's threaded batch
+BATCH_ENCODE_MIN_CHARS = 64 * 1024
+# Once more than this many messages sit outside the summary, the older ones are folded into it
+SUMMARY_TRIGGER = 20
+# The newest messages are always sent verbatim, never summarized
+SUMMARY_KEEP_RECENT = 10
+
+# Session name sanitization: whitespace runs become hyphens, anything else outside [a-z0-9-] is dropped
+_WHITESPACE_RE = re.compile(r'\s+')
+_SANITIZE_RE = re.compile(r'[^a-z0-9-]+')
+# Words used for the provisional (locally derived) session title
+_WORD_RE = re.compile(r'[a-z]+')
+
+# --- FIX: Custom System Persona (built once, prepended to every chat request) ---
+SYSTEM_MSG = {
+    "role": "system",
+    "content": "You are 'NeuraX', a  AI assistant. "
+}
+# First message of a session: the reply also names the conversation, saving a separate title call
+SYSTEM_MSG_WITH_TITLE = {
+    "role": "system",
+    "content": SYSTEM_MSG["content"] + "Start your reply with one line of the form 'TITLE: <very short title for this conversation, max 5 words, lowercase, words separated by hyphens>', then answer the user on the following lines."
+}
+TITLE_PREFIX = "TITLE:"
+
+@dataclass(slots=True, frozen=True)
+class Msg:
+    """One chat turn. Slotted, so a long history costs far less memory than a list of dicts."""
+    role: str
+    content: str
+
+    def to_dict(self):
+        """Plain dict form expected by the OpenAI API."""
+        return {"role": self.role, "content": self.content}
 
 # --- Python Functions ---
 
-def count_tokens(text):
-    """Counts tokens in a string using tiktoken."""
-    try:
-        # Using a common model for token counting
-        encoding = tiktoken.encoding_for_model("gpt-3.5-turbo")
-    except KeyError:
-        # Fallback encoding
-        encoding = tiktoken.get_encoding("cl100k_base")
-    tokens = encoding.encode(text)
-    return len(tokens)
-
-def chat_with_ai(messages):
-    """Sends messages to the OpenAI Chat API with a custom persona."""
+def count_tokens(texts):
+    """Counts tokens for each string in a list."""
+    # The "ordinary" encoders skip the special-token scan and treat text like "<|endoftext|>" as
+    # plain text instead of raising. encode_ordinary_batch starts a fresh thread pool on every call,
+    # which only pays off for large inputs; typical chat histories are cheaper to encode in a loop
+    if sum(map(len, texts)) >= BATCH_ENCODE_MIN_CHARS:
+        return [len(tokens) for tokens in _ENCODING.encode_ordinary_batch(texts, num_threads=os.cpu_count() or 1)]
+    return [len(_ENCODING.encode_ordinary(text)) for text in texts]
+
+def truncate_messages(messages, token_counts, budget):
+    """Returns the newest messages whose token counts fit in budget. The latest message is always kept."""
+    total = 0
+    start = len(messages)
+    for i in range(len(messages) - 1, -1, -1):
+        total += token_counts[i]
+        if total > budget and start < len(messages):
+            break
+        start = i
+    return messages[start:]
+
+def dumps_json(obj):
+    """Serializes obj to UTF-8 JSON bytes, using orjson when it is installed."""
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj, separators=(",", ":"), default=asdict).encode("utf-8")
+
+def loads_json(data):
+    """Parses JSON bytes or str, using orjson when it is installed."""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+def sanitize_session_name(name):
+    """Turns free text into a session ID: lowercase, hyphen-separated, only [a-z0-9-]."""
+    return _SANITIZE_RE.sub('', _WHITESPACE_RE.sub('-', name.strip().lower())).strip('-')
+
+def save_history(session_id, history):
+    """Stores a session's history (a list of Msg) as a JSON blob."""
+    global sessions_version
+    with sessions_lock:
+        # Also moves the session to the most recent end, spilling the coldest ones past MAX_SESSIONS
+        chat_sessions[session_id] = dumps_json(history)
+        # The ID now names a real session, so it must no longer redirect to an older one
+        session_aliases.pop(session_id, None)
+        # Bumped only after the write: get_sessions reads the version without the lock, and must never
+        # tag the old key list with the new ETag
+        sessions_version += 1
+
+def load_history(session_id):
+    """Returns a session's history as a list of Msg, or None if it doesn't exist."""
+    blob = chat_sessions.get(session_id)
+    if blob is None:
+        return None
+    return [Msg(msg["role"], msg["content"]) for msg in loads_json(blob)]
+
+# Rebuild the sessions from the previous run, then log every change from here on
+if SESSIONS_LOG:
+    session_log = SessionLog(SESSIONS_LOG, SESSIONS_LOG_MAX_BYTES)
+    # Only one process may own the log. On a graceful reload the old worker still holds it until its
+    # exit flush, so wait for that; serving an empty, unlogged store instead would drop every session.
+    if not session_log.lock(SESSIONS_LOG_LOCK_TIMEOUT):
+        raise RuntimeError(f"{SESSIONS_LOG} is still locked by another process after {SESSIONS_LOG_LOCK_TIMEOUT:g}s")
+    session_log.replay(chat_sessions)
+    chat_sessions.log = session_log
+    session_log.start()
+
+def chat_with_ai(messages, prompt_tokens=0, with_title=False):
+    """Streams a reply from the OpenAI Chat API with a custom persona, yielding text deltas.
+
+    prompt_tokens is the token count of messages, used to pace calls under the TPM limit.
+    with_title asks the model to open with a 'TITLE: ...' line (see split_title_line).
+    """
     try:
-        # --- FIX: Define the Custom System Persona ---
-        custom_system_instruction = {
-            "role": "system",
-            "content": "You are 'NeuraX', a  AI assistant. "
-        }
-        
-        # 1. Insert the persona instruction at the beginning of the message list
-        #    Note: 'messages' should be the full history passed in the API call.
+        # Insert the persona instruction at the beginning of the message list
+        # Note: 'messages' should be the full history passed in the API call.
         
         # This creates the final message list sent to the API: [SYSTEM, USER_MSG_1, AI_MSG_1, USER_MSG_2, ...]
-        messages_with_persona = [custom_system_instruction] + messages 
+        # Msg objects are converted to dicts only here, at the API boundary
+        system_msg = SYSTEM_MSG_WITH_TITLE if with_title else SYSTEM_MSG
+        messages_with_persona = [system_msg, *(msg.to_dict() for msg in messages)]
+        # The title line gets a little extra room on top of the normal 150-token reply
+        max_tokens = 170 if with_title else 150
         
         # Check if the placeholder key is used and prevent API call if so
         if not api_key and client.api_key == "placeholder_key":
-            return "Please set the AI_API_KEY environment variable to use the chat functionality."
-            
-        response = client.chat.completions.create(
-            model="gpt-3.5-turbo",
+            yield "Please set the AI_API_KEY environment variable to use the chat functionality."
+            return
+
+        # Reserve rate-limit capacity for the prompt plus the largest possible reply
+        rate_limiter.acquire(prompt_tokens + max_tokens)
+        # The with block closes the stream even when this generator is closed early (client gone),
+        # so OpenAI stops generating and the connection goes back to the pool
+        with client.chat.completions.create(
+            model=MODEL,
             messages=messages_with_persona, # Use the list with the new system message
-            max_tokens=150,
-            temperature=0.8 # Higher temperature for personality
-        )
-        return response.choices[0].message.content.strip()
+            max_tokens=max_tokens,
+            temperature=0.8, # Higher temperature for personality
+            stream=True # Tokens are forwarded to the browser as they arrive
+        ) as stream:
+            for chunk in stream:
+                if chunk.choices and chunk.choices[0].delta.content:
+                    yield chunk.choices[0].delta.content
     except Exception as e:
         # ... (error handling remains the same) ...
-        return f"An error occurred while communicating with the AI: {str(e)}"
+        yield f"An error occurred while communicating with the AI: {str(e)}"
+
+def split_title_line(deltas, found):
+    """Passes reply deltas through, removing a leading 'TITLE: ...' line and storing its text in found['title']."""
+    buffer = ""
+    for delta in deltas:
+        if buffer is None:
+            yield delta
+            continue
+        buffer += delta
+        head = buffer.lstrip()
+        # Hold text back only while it could still turn out to be the title line
+        if TITLE_PREFIX.startswith(head[:len(TITLE_PREFIX)].upper()) and "\n" not in head:
+            continue
+        if head.upper().startswith(TITLE_PREFIX):
+            title_line, _, buffer = head.partition("\n")
+            found['title'] = title_line.split(":", 1)[1].strip()
+        if buffer:
+            yield buffer
+        buffer = None
+    # The stream ended while still holding text back
+    if buffer:
+        if buffer.lstrip().upper().startswith(TITLE_PREFIX):
+            found['title'] = buffer.split(":", 1)[1].strip()
+        else:
+            yield buffer
+
+def generate_title(user_message):
+    """Asks the model for a short hyphenated title; repeated and concurrent calls for the same message share one request."""
+    # A fixed-size digest keeps long messages out of the cache keys
+    key = hashlib.blake2b(user_message.encode('utf-8'), digest_size=16).digest()
+    with title_requests_lock:
+        title = title_cache.get(key)
+        if title is not None:
+            title_cache.move_to_end(key)
+            return title
+        future = title_requests.get(key)
+        is_owner = future is None
+        if is_owner:
+            future = title_requests[key] = Future()
+    if not is_owner:
+        return future.result()
+
+    try:
+        title = request_title(user_message)
+        with title_requests_lock:
+            title_cache[key] = title
+            if len(title_cache) > TITLE_CACHE_SIZE:
+                title_cache.popitem(last=False)
+        future.set_result(title)
+        return title
+    except Exception as e:
+        future.set_exception(e)
+        raise
+    finally:
+        with title_requests_lock:
+            del title_requests[key]
+
+def request_title(user_message):
+    """Asks the model for a short hyphenated title based on the user's first message."""
+    title_messages = [
+        {"role": "system", "content": "You are a title generator. Create a very short title (max 5 words, lowercase, separate words with hyphens) for a chat conversation based on the user's first message."},
+        {"role": "user", "content": user_message}
+    ]
+    # Separate call, separate cost
+    rate_limiter.acquire(sum(count_tokens([msg["content"] for msg in title_messages])) + 10)
+    return client.chat.completions.create(
+        model=MODEL,
+        messages=title_messages,
+        max_tokens=10,
+        temperature=0.7
+    ).choices[0].message.content.strip()
+
+def request_summary(previous_summary, messages):
+    """Asks the model to fold messages (a list of Msg) into the running summary of a conversation."""
+    transcript = "\n".join(f"{msg.role}: {msg.content}" for msg in messages)
+    if previous_summary:
+        transcript = f"Summary so far: {previous_summary}\n\n{transcript}"
+    summary_messages = [
+        {"role": "system", "content": "Summarize this conversation between a user and the assistant 'NeuraX' in at most 150 words. Keep names, facts, decisions and open questions."},
+        {"role": "user", "content": transcript}
+    ]
+    rate_limiter.acquire(sum(count_tokens([msg["content"] for msg in summary_messages])) + 200)
+    return client.chat.completions.create(
+        model=MODEL,
+        messages=summary_messages,
+        max_tokens=200,
+        temperature=0.3
+    ).choices[0].message.content.strip()
+
+def schedule_summary(session_id, history_length):
+    """Queues a background summary once enough messages have piled up outside the session's summary."""
+    with sessions_lock:
+        covered = session_summaries.get(session_id, (0, ""))[0]
+        if not api_key or history_length - covered <= SUMMARY_TRIGGER or session_id in summarizing:
+            return
+        summarizing.add(session_id)
+    executor.submit(apply_summary, session_id)
+
+def apply_summary(session_id):
+    """Background job: folds all but the newest messages of a session into its running summary."""
+    try:
+        history = load_history(session_id) or []
+        covered, summary = session_summaries.get(session_id, (0, ""))
+        end = len(history) - SUMMARY_KEEP_RECENT
+        if end <= covered:
+            return
+        try:
+            summary = request_summary(summary, history[covered:end])
+        except Exception as e:
+            print(f"Failed to summarize session {session_id}: {e}. Keeping the previous summary.")
+            return
+        with sessions_lock:
+            # Dropped if the session was renamed or deleted meanwhile (possibly replaced by a new chat with
+            # the same name): only keep it if the summarized messages are still the start of this history
+            current = load_history(session_id) or []
+            if current[:end] == history[:end]:
+                session_summaries[session_id] = (end, summary)
+    finally:
+        with sessions_lock:
+            summarizing.discard(session_id)
+
+def resolve_session_id(session_id):
+    """Follows background renames so a client holding a provisional ID still reaches its session."""
+    seen = set()
+    while session_id and session_id not in chat_sessions and session_id in session_aliases and session_id not in seen:
+        seen.add(session_id)
+        session_id = session_aliases[session_id]
+    return session_id
+
+def allocate_session_name(base_name, current_session_id=None):
+    """Returns a session name based on base_name that is unused (or already belongs to current_session_id)."""
+    with sessions_lock:
+        if base_name not in chat_sessions or base_name == current_session_id:
+            return base_name
+        # Renaming "name-2" to "name" keeps its existing suffix
+        if current_session_id and current_session_id.startswith(f"{base_name}-") and current_session_id[len(base_name) + 1:].isdigit():
+            return current_session_id
+
+        # Start probing from the next free suffix instead of counting up from 1 every time
+        counter = name_suffixes.get(base_name, 1)
+        unique_name = f"{base_name}-{counter}"
+        while unique_name in chat_sessions and unique_name != current_session_id:
+            counter += 1
+            unique_name = f"{base_name}-{counter}"
+        name_suffixes[base_name] = counter + 1
+        return unique_name
+
+def rename_session(old_session_id, base_name):
+    """Moves a session to a unique name derived from base_name. Returns the new ID, or None if the session is gone."""
+    global sessions_version
+    with sessions_lock:
+        if old_session_id not in chat_sessions:
+            return None
+
+        # Check for uniqueness and prevent renaming to self
+        unique_name = allocate_session_name(base_name, old_session_id)
+
+        if unique_name != old_session_id:
+            # Move the history from the old key to the new key
+            chat_sessions[unique_name] = chat_sessions.pop(old_session_id)
+            if old_session_id in session_summaries:
+                session_summaries[unique_name] = session_summaries.pop(old_session_id)
+            # Keep aliases pointing at a live ID, so a later session taking old_session_id doesn't inherit them
+            session_aliases.pop(unique_name, None)
+            for alias, target in session_aliases.items():
+                if target == old_session_id:
+                    session_aliases[alias] = unique_name
+            sessions_version += 1
+        return unique_name
+
+def apply_generated_title(session_id, user_message):
+    """Background job: replaces a provisional session name with an LLM-generated title."""
+    try:
+        title_response = generate_title(user_message)
+    except Exception as e:
+        print(f"Failed to generate dynamic title: {e}. Keeping provisional name.")
+        return
+
+    base_name = sanitize_session_name(title_response)
+    if not base_name:
+        return
+
+    with sessions_lock:
+        new_session_id = rename_session(session_id, base_name)
+        if new_session_id and new_session_id != session_id:
+            session_aliases[session_id] = new_session_id
+            if len(session_aliases) > SESSION_ALIASES_SIZE:
+                session_aliases.popitem(last=False)
 
 # --- Flask Routes ---
 
 @app.route('/')
 def home():
-    """Renders the main chat application interface."""
-    return render_template_string(HTML_CONTENT)
+    """Serves the main chat application interface."""
+    # HTML_CONTENT has no template placeholders, so skip Jinja and send the pre-encoded page.
+    # no-cache: the page names the current asset hashes, so it is revalidated (a cheap 304) on every load
+    return send_precompressed(_HOME, 'text/html', _HOME_ETAG, 'no-cache')
+
+@app.route('/assets/<name>')
+def asset(name):
+    """Serves the page's CSS/JS. The name carries a content hash, so browsers may cache it forever."""
+    if name not in _ASSETS:
+        return jsonify({'error': 'Asset not found'}), 404
+    variants, mimetype, etag = _ASSETS[name]
+    return send_precompressed(variants, mimetype, etag, 'public, max-age=31536000, immutable')
+
+def store_chat_turn(current_session_id, user_message, updated_history, title=None):
+    """Saves the updated history, naming the session on its first message. Returns the session ID.
+
+    title is the model's suggested title from the first reply, if it provided one.
+    """
+    global session_counter
+    with sessions_lock:
+        current_session_id = resolve_session_id(current_session_id)
+
+        # Dynamic Session Naming Logic
+        is_new_session = not current_session_id or current_session_id not in chat_sessions
+        name_in_background = False
+
+        if is_new_session and len(updated_history) == 2:
+            base_name = sanitize_session_name(title) if title else ""
+            if not base_name:
+                # No usable title in the reply: use a provisional title derived locally
+                base_name = "-".join(_WORD_RE.findall(user_message.lower()))[:40].strip('-')
+                if not base_name:
+                    base_name = "new-chat"
+                # Only ask the LLM for a better title if we have a real API key
+                name_in_background = bool(api_key)
+
+            current_session_id = allocate_session_name(base_name)
+
+        # If it was an existing session that the server no longer knows, ensure ID is set
+        if not current_session_id:
+            session_counter += 1
+            current_session_id = f"session_{session_counter}"
+
+        save_history(current_session_id, updated_history)
+
+    if name_in_background:
+        # Rename once the title call completes; the client picks the new ID up via resolve_session_id
+        executor.submit(apply_generated_title, current_session_id, user_message)
+    return current_session_id
+
+def sse_event(payload):
+    """Formats a payload as one Server-Sent Events message."""
+    return b"data: " + dumps_json(payload) + b"\n\n"
+
+def precompress(body):
+    """Compresses a static body once, returning {content_encoding: bytes} for send_precompressed."""
+    variants = {'identity': body, 'gzip': gzip.compress(body, compresslevel=9)}
+    if brotli is not None:
+        variants['br'] = brotli.compress(body, quality=11)
+    return variants
+
+def send_precompressed(variants, mimetype, etag, cache_control):
+    """Responds with the best encoding the client accepts; compression cost nothing per request."""
+    # Brotli packs noticeably tighter than gzip, so prefer it when both are accepted
+    encoding = next((e for e in ('br', 'gzip') if e in variants and request.accept_encodings[e]), 'identity')
+    headers = {'Cache-Control': cache_control, 'Vary': 'Accept-Encoding'}
+    if encoding != 'identity':
+        headers['Content-Encoding'] = encoding
+        etag = f"{etag}-{encoding}"
+    response = Response(variants[encoding], mimetype=mimetype, headers=headers)
+    response.set_etag(etag)
+    # Answers If-None-Match revalidations with an empty 304
+    return response.make_conditional(request)
+
+def not_modified(etag):
+    """Empty 304 response telling the client its cached copy (tagged etag) is still current."""
+    response = Response(status=304)
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
 
 @app.route('/api/chat', methods=['POST'])
 def handle_chat():
-    """Handles sending a new message, updating history, and creating/naming sessions."""
-    global session_counter
-    user_message = request.json.get('message')
-    history = request.json.get('history', [])
-    current_session_id = request.json.get('sessionId')
+    """Handles sending a new message: streams the reply as SSE, then updates history and names the session."""
+    # Parse the body once; a missing or malformed body falls through to the 400 below instead of a 415
+    payload = request.get_json(silent=True)
+    # Valid JSON that isn't an object (e.g. [1]) gets the same 400
+    if not isinstance(payload, dict):
+        payload = {}
+    user_message = payload.get('message')
+    current_session_id = payload.get('sessionId')
 
     if not user_message:
         return jsonify({'error': 'No message provided'}), 400
 
+    # The history lives on the server; the client only sends the new message and its session ID
+    stored_session_id = resolve_session_id(current_session_id)
+    history = load_history(stored_session_id) or []
+
     # Include system instruction to guide the conversation behavior if needed
     # (Leaving it out here to match the original structure, but it's a good practice)
-    messages = history + [{"role": "user", "content": user_message}]
-    
-    # Generate the main AI response
-    ai_response = chat_with_ai(messages)
-    token_count = count_tokens(user_message)
-
-    updated_history = messages + [{"role": "assistant", "content": ai_response}]
-    
-    # Dynamic Session Naming Logic (calls LLM for title on first message)
-    is_new_session = not current_session_id or current_session_id not in chat_sessions
-    
-    if is_new_session and len(updated_history) == 2:
-        # Only attempt title generation if we have a real API key
-        if api_key:
-            title_messages = [
-                {"role": "system", "content": "You are a title generator. Create a very short title (max 5 words, lowercase, separate words with hyphens) for a chat conversation based on the user's first message."},
-                {"role": "user", "content": user_message}
-            ]
-            try:
-                # Call AI to generate a title (separate call, separate cost)
-                title_response = client.chat.completions.create(
-                    model="gpt-3.5-turbo",
-                    messages=title_messages,
-                    max_tokens=10,
-                    temperature=0.7
-                ).choices[0].message.content.strip()
-
-                # Sanitize and make unique
-                base_name = "-".join(title_response.lower().split())
-                base_name = ''.join(filter(lambda x: x.isalpha() or x == '-', base_name)).strip('-')
-                if not base_name:
-                    base_name = "new-chat"
-                
-                unique_name = base_name
-                counter = 1
-                while unique_name in chat_sessions:
-                    unique_name = f"{base_name}-{counter}"
-                    counter += 1
-                current_session_id = unique_name
-            except Exception as e:
-                # Fallback on title generation failure
-                session_counter += 1
-                current_session_id = f"session_{session_counter}"
-                print(f"Failed to generate dynamic title: {e}. Using fallback.")
-        else:
-            # Fallback when no API key is set
-            session_counter += 1
-            current_session_id = f"session_{session_counter}"
-
-    # If it was an existing session or title generation failed/skipped, ensure ID is set
-    if not current_session_id:
-        session_counter += 1
-        current_session_id = f"session_{session_counter}"
-            
-    chat_sessions[current_session_id] = updated_history
-
-    return jsonify({
-        'response': ai_response,
-        'tokens': token_count,
-        'sessionId': current_session_id,
-        'fullHistory': updated_history
-    })
+    messages = history + [Msg("user", user_message)]
+
+    # Turns already folded into the running summary are sent as the summary instead
+    covered, summary = session_summaries.get(stored_session_id, (0, "")) if history else (0, "")
+    # Never let a stale summary swallow turns it doesn't cover (the new message is always sent)
+    covered = min(covered, len(history))
+    summary_msgs = [Msg("system", f"Summary of the earlier conversation: {summary}")] if summary else []
+
+    # Only the newest turns that fit the context budget are sent; the full history is still stored
+    token_counts = count_tokens([msg.content for msg in messages + summary_msgs])
+    message_tokens = token_counts[:len(messages)]
+    summary_tokens = sum(token_counts[len(messages):])
+    recent_messages = truncate_messages(messages[covered:], message_tokens[covered:], MAX_CONTEXT_TOKENS - summary_tokens)
+    prompt_messages = summary_msgs + recent_messages
+    prompt_tokens = summary_tokens + sum(message_tokens[-len(recent_messages):])
+
+    # On the first message the reply also carries the session title
+    with_title = not history and bool(api_key)
+
+    def stream():
+        # Forward each delta as soon as OpenAI sends it
+        parts = []
+        found = {}
+        reply = chat_with_ai(prompt_messages, prompt_tokens, with_title)
+        deltas = split_title_line(reply, found) if with_title else reply
+        try:
+            for delta in deltas:
+                parts.append(delta)
+                yield sse_event({'delta': delta})
+        finally:
+            # If the browser disconnected, closing the reply generator also closes the OpenAI stream
+            reply.close()
+            ai_response = "".join(parts).strip()
+
+            # The turn is stored even when the client went away mid-reply, with whatever text arrived,
+            # so reloading the page doesn't lose the user's message
+            updated_history = messages + [Msg("assistant", ai_response)]
+            session_id = store_chat_turn(current_session_id, user_message, updated_history, found.get('title'))
+            schedule_summary(session_id, len(updated_history))
+
+        # The history was already counted for truncation; only the short reply is new.
+        # The user message is second to last
+        token_counts = message_tokens + [len(_ENCODING.encode_ordinary(ai_response))]
+
+        # Final event: only the two new turns are sent back; the client appends them to its own copy
+        yield sse_event({
+            'done': True,
+            'response': ai_response,
+            'tokens': token_counts[-2],
+            'historyTokens': sum(token_counts),
+            'sessionId': session_id,
+            'appended': updated_history[-2:]
+        })
+
+    # X-Accel-Buffering stops reverse proxies (nginx) from holding the stream back
+    return Response(stream(), mimetype='text/event-stream', headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
 
 @app.route('/api/get_sessions', methods=['GET'])
 def get_sessions():
     """Returns a list of all current session IDs."""
-    return jsonify({'sessions': list(chat_sessions.keys())})
+    etag = f"{SESSIONS_ETAG_PREFIX}-{sessions_version}"
+    # Nothing changed since the client's copy: skip building and sending the list
+    if request.if_none_match.contains(etag):
+        return not_modified(etag)
+    response = jsonify({'sessions': list(chat_sessions.keys())})
+    response.set_etag(etag)
+    # Content hash the client uses to skip re-rendering an unchanged list (stable across restarts)
+    response.headers['X-Sessions-Hash'] = hashlib.blake2b(response.get_data(), digest_size=8).hexdigest()
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
 
 @app.route('/api/load_session/<session_id>', methods=['GET'])
 def load_session_route(session_id):
     """Loads and returns the history for a specific session ID."""
-    history = chat_sessions.get(session_id)
-    if history:
-        return jsonify({'history': history})
+    blob = chat_sessions.get(resolve_session_id(session_id))
+    if blob:
+        etag = hashlib.blake2b(blob, digest_size=8).hexdigest()
+        if request.if_none_match.contains(etag):
+            return not_modified(etag)
+        # The stored blob is already JSON, so splice it in instead of decoding and re-encoding
+        response = Response(b'{"history":' + blob + b'}', mimetype='application/json')
+        response.set_etag(etag)
+        response.headers['Cache-Control'] = 'no-cache'
+        return response
     return jsonify({'error': 'Session not found'}), 404
 
 # NEW: Route for renaming 
 @app.route('/api/rename_session/<old_session_id>', methods=['POST'])
 def rename_session_route(old_session_id):
     """Renames a session. NOTE: This is complex due to in-memory storage."""
-    new_name = request.json.get('new_name')
+    payload = request.get_json(silent=True)
+    if not isinstance(payload, dict):
+        payload = {}
+    new_name = payload.get('new_name')
     
     if not new_name:
         return jsonify({'error': 'New name required'}), 400
     
     # Sanitize: lowercase, replace spaces with hyphens, keep only alphanumeric and hyphens
-    sanitized_name = "-".join(new_name.lower().split())
-    sanitized_name = ''.join(filter(lambda x: x.isalpha() or x.isdigit() or x == '-', sanitized_name)).strip('-')
+    sanitized_name = sanitize_session_name(new_name)
     
     if not sanitized_name:
         return jsonify({'error': 'Invalid new name after sanitization'}), 400
-        
-    unique_name = sanitized_name
-    counter = 1
-    # Check for uniqueness and prevent renaming to self
-    while unique_name in chat_sessions and unique_name != old_session_id:
-        unique_name = f"{sanitized_name}-{counter}"
-        counter += 1
+
+    old_session_id = resolve_session_id(old_session_id)
+    unique_name = rename_session(old_session_id, sanitized_name)
+
+    if unique_name is None:
+        return jsonify({'error': 'Session not found'}), 404
         
     if unique_name == old_session_id:
         return jsonify({'message': f"Session ID remains {old_session_id} (name unchanged).", 'new_session_id': old_session_id})
 
-    if old_session_id in chat_sessions:
-        # Move the history from the old key to the new key
-        chat_sessions[unique_name] = chat_sessions.pop(old_session_id)
-        return jsonify({'message': f"Session renamed from {old_session_id} to {unique_name}", 'new_session_id': unique_name})
-        
-    return jsonify({'error': 'Session not found'}), 404
+    return jsonify({'message': f"Session renamed from {old_session_id} to {unique_name}", 'new_session_id': unique_name})
 
 
 @app.route('/api/delete_session/<session_id>', methods=['DELETE'])
 def delete_session_route(session_id):
     """Deletes a session from memory."""
-    if session_id in chat_sessions:
-        del chat_sessions[session_id]
-        return jsonify({'message': f"Session {session_id} deleted successfully."})
+    global sessions_version
+    with sessions_lock:
+        session_id = resolve_session_id(session_id)
+        if session_id in chat_sessions:
+            del chat_sessions[session_id]
+            session_summaries.pop(session_id, None)
+            # Stale IDs must not reach whichever session takes this name next
+            for alias in [alias for alias, target in session_aliases.items() if target == session_id]:
+                del session_aliases[alias]
+            sessions_version += 1
+            return jsonify({'message': f"Session {session_id} deleted successfully."})
     return jsonify({'error': 'Session not found'}), 404
 
 # --- HTML, CSS, and JavaScript Content ---
@@ -703,6 +1408,30 @@ HTML_CONTENT = """
         <div id="sessions-list" class="sessions-list"></div>
     </div>
 
+    <!-- Session item markup, parsed once and cloned for every item in renderSessions -->
+    <template id="tpl-ellipsis">
+        <svg xmlns="http://www.w3.org/2000/svg" width="20" height="20" viewBox="0 0 24 24" fill="none" stroke="currentColor" stroke-width="2" stroke-linecap="round" stroke-linejoin="round">
+            <circle cx="12" cy="12" r="1"></circle>
+            <circle cx="19" cy="12" r="1"></circle>
+            <circle cx="5" cy="12" r="1"></circle>
+        </svg>
+    </template>
+    <template id="tpl-rename">
+        <li class="session-menu-item" data-action="rename">
+            <svg xmlns="http://www.w3.org/2000/svg" width="18" height="18" viewBox="0 0 24 24" fill="none" stroke="currentColor" stroke-width="2" stroke-linecap="round" stroke-linejoin="round"><path d="M12 20h9"/><path d="M16.5 3.5a2.121 2.121 0 0 1 3 3L7 19l-4 1 1-4L16.5 3.5z"/></svg>
+            <span>Rename</span>
+        </li>
+    </template>
+    <template id="tpl-delete">
+        <li class="session-menu-item delete-option" data-action="delete">
+            <svg xmlns="http://www.w3.org/2000/svg" width="18" height="18" viewBox="0 0 24 24" fill="none" stroke="currentColor" stroke-width="2" stroke-linecap="round" stroke-linejoin="round">
+                <polyline points="3 6 5 6 21 6"></polyline>
+                <path d="M19 6v14a2 2 0 0 1-2 2H7a2 2 0 0 1-2-2V6m3 0V4a2 2 0 0 1 2-2h4a2 2 0 0 1 2 2v2"></path>
+            </svg>
+            <span>Delete</span>
+        </li>
+    </template>
+
     <div class="chat-container">
         <div class="chat-box" id="chat-box">
             </div>
@@ -727,10 +1456,29 @@ HTML_CONTENT = """
         const sendBtn = document.getElementById('send-btn');
         const startNewSessionBtn = document.getElementById('start-new-session');
         const sessionsList = document.getElementById('sessions-list');
+        const ellipsisTpl = document.getElementById('tpl-ellipsis').content;
+        const renameTpl = document.getElementById('tpl-rename').content;
+        const deleteTpl = document.getElementById('tpl-delete').content;
 
         let sessionHistory = [];
         let currentSessionId = null;
 
+        // At most one menu is open and one session button is active, so track them directly
+        // instead of scanning every session item on each click
+        let openMenuEl = null;
+        let activeBtnEl = null;
+
+        function closeOpenMenu() {
+            if (openMenuEl) openMenuEl.classList.remove('show');
+            openMenuEl = null;
+        }
+
+        function setActiveButton(button) {
+            if (activeBtnEl) activeBtnEl.classList.remove('active');
+            activeBtnEl = button || null;
+            if (activeBtnEl) activeBtnEl.classList.add('active');
+        }
+
         // Toggle handler
         menuToggle.addEventListener('click', () => {
             sidebar.classList.toggle('expanded');
@@ -739,43 +1487,122 @@ HTML_CONTENT = """
         // Close menu when clicking outside
         document.addEventListener('click', (event) => {
             if (!event.target.closest('.session-item')) {
-                document.querySelectorAll('.session-menu').forEach(menu => {
-                    menu.classList.remove('show');
-                });
+                closeOpenMenu();
             }
         });
 
-        function appendMessage(sender, message) {
-            const messageDiv = document.createElement('div');
-            messageDiv.classList.add('message', sender);
-            
-            // Basic Markdown to HTML conversion for clarity
-            let formattedMessage = message.replace(/\*\*(.*?)\*\*/g, '<strong>$1</strong>');
+        const HTML_ESCAPES = { '&': '&amp;', '<': '&lt;', '>': '&gt;', '"': '&quot;', "'": '&#39;' };
+        function escapeHtml(text) {
+            return text.replace(/[&<>"']/g, ch => HTML_ESCAPES[ch]);
+        }
+
+        function setMessageContent(messageDiv, message) {
+            // Nothing to format: skip the HTML parser entirely
+            if (!/[*\\n]/.test(message)) {
+                messageDiv.textContent = message;
+                return;
+            }
+
+            // Basic Markdown to HTML conversion for clarity; the text is escaped first so it can't inject markup
+            let formattedMessage = escapeHtml(message).replace(/\*\*(.*?)\*\*/g, '<strong>$1</strong>');
             formattedMessage = formattedMessage.replace(/([^\S]|^)\*(.*?)\*/g, '$1<em>$2</em>');
 
             // Handle newlines as breaks
             formattedMessage = formattedMessage.replace(/\\n/g, '<br/>');
 
             messageDiv.innerHTML = formattedMessage;
+        }
+
+        function createMessage(sender, message) {
+            const messageDiv = document.createElement('div');
+            messageDiv.classList.add('message', sender);
+            setMessageContent(messageDiv, message);
+            return messageDiv;
+        }
+
+        function appendMessage(sender, message) {
+            const messageDiv = createMessage(sender, message);
             chatBox.appendChild(messageDiv);
             chatBox.scrollTop = chatBox.scrollHeight;
+            return messageDiv;
+        }
+
+        /**
+         * Reads the /api/chat Server-Sent Events stream, growing the AI bubble as deltas arrive.
+         * Resolves with the final event (sessionId, history, token counts), or null if the stream ended early.
+         */
+        async function readChatStream(response) {
+            const reader = response.body.getReader();
+            const decoder = new TextDecoder();
+            let aiDiv = null;
+            let aiText = '';
+            let buffer = '';
+            let finalEvent = null;
+
+            while (true) {
+                const { value, done } = await reader.read();
+                if (done) break;
+                buffer += decoder.decode(value, { stream: true });
+
+                // Events are separated by a blank line; keep any partial event in the buffer
+                let boundary;
+                while ((boundary = buffer.indexOf('\\n\\n')) !== -1) {
+                    const rawEvent = buffer.slice(0, boundary);
+                    buffer = buffer.slice(boundary + 2);
+                    if (!rawEvent.startsWith('data: ')) continue;
+
+                    const payload = JSON.parse(rawEvent.slice(6));
+                    if (payload.done) {
+                        finalEvent = payload;
+                    } else if (payload.delta) {
+                        aiText += payload.delta;
+                        if (!aiDiv) {
+                            aiDiv = appendMessage('ai', aiText.trim());
+                        } else {
+                            setMessageContent(aiDiv, aiText.trim());
+                            chatBox.scrollTop = chatBox.scrollHeight;
+                        }
+                    }
+                }
+            }
+            return finalEvent;
+        }
+
+        // The Spline viewer module is large; fetch it once, after first paint, and only while the empty state is shown
+        const SPLINE_VIEWER_URL = 'https://unpkg.com/@splinetool/viewer@1.10.52/build/spline-viewer.js';
+        let splineViewerLoad = null;
+        function loadSplineViewerWhenIdle() {
+            if (splineViewerLoad) return;
+            splineViewerLoad = new Promise(resolve => (window.requestIdleCallback || setTimeout)(resolve))
+                .then(() => {
+                    // A message may have been sent (removing the viewer) before the browser went idle
+                    if (!document.getElementById('spline-viewer')) {
+                        splineViewerLoad = null;
+                        return;
+                    }
+                    return import(SPLINE_VIEWER_URL);
+                })
+                .catch(error => {
+                    splineViewerLoad = null; // Let a later empty state retry
+                    console.error('Error loading Spline viewer:', error);
+                });
         }
 
         function renderSessionHistory() {
-            chatBox.innerHTML = '';
-            
-            // Remove any old spline viewer tags for cleanup
-            let oldSpline = document.getElementById('spline-viewer');
-            if (oldSpline) oldSpline.remove();
+            // Clears the chat box, including any old spline viewer
+            chatBox.replaceChildren();
 
             if (sessionHistory.length > 0) {
-                // If history exists, render messages
+                // If history exists, render messages off-document and insert them in one go
+                const frag = document.createDocumentFragment();
                 sessionHistory.forEach(msg => {
                     // Prevent system messages from being displayed in the main chat view
                     if (msg.role !== 'system') {
-                        appendMessage(msg.role, msg.content);
+                        frag.appendChild(createMessage(msg.role, msg.content));
                     }
                 });
+                chatBox.appendChild(frag);
+                chatBox.scrollTop = chatBox.scrollHeight;
             } else {
                 // If history is empty, show the welcome state with the spline viewer
                 const splineViewer = document.createElement('spline-viewer');
@@ -789,19 +1616,15 @@ HTML_CONTENT = """
                 initialStateDiv.innerHTML = ''; 
                 chatBox.appendChild(initialStateDiv);
                 
-                // Load Spline viewer script (ensure it's loaded if not already)
-                if (!document.querySelector('script[src*="spline-viewer.js"]')) {
-                    const splineScript = document.createElement('script');
-                    splineScript.type = 'module';
-                    splineScript.src = 'https://unpkg.com/@splinetool/viewer@1.10.52/build/spline-viewer.js';
-                    document.head.appendChild(splineScript);
-                }
+                // The <spline-viewer> element upgrades itself once the module has loaded
+                loadSplineViewerWhenIdle();
             }
         }
 
         async function sendMessage() {
             const message = userInput.value.trim();
             if (message === '') return;
+            const sentSessionId = currentSessionId;
             
             // Disable inputs while waiting for response
             sendBtn.disabled = true;
@@ -821,30 +1644,36 @@ HTML_CONTENT = """
             // Append user message to the chat box
             appendMessage('user', message);
             
-            const historyForApi = sessionHistory.map(msg => ({ "role": msg.role, "content": msg.content }));
             userInput.value = ''; // Clear input immediately
             
             try {
                 const response = await fetch('/api/chat', {
                     method: 'POST',
                     headers: { 'Content-Type': 'application/json' },
-                    body: JSON.stringify({ message: message, history: sessionHistory, sessionId: currentSessionId }),
+                    body: JSON.stringify({ message: message, sessionId: currentSessionId }),
                 });
-                const data = await response.json();
-                
+                // Successful replies are streamed; errors still come back as plain JSON
+                const data = response.ok ? await readChatStream(response) : await response.json();
+
                 // Re-enable inputs regardless of outcome
                 sendBtn.disabled = false;
                 userInput.disabled = false;
 
-                if (response.ok) {
-                    sessionHistory = data.fullHistory;
+                if (response.ok && data) {
+                    sessionHistory.push(...data.appended);
+                    // The server may have renamed the session in the background (generated title)
+                    if (sentSessionId && data.sessionId !== sentSessionId) {
+                        renameSessionLocally(sentSessionId, data.sessionId);
+                    }
                     currentSessionId = data.sessionId;
-                    
-                    // Append AI response
-                    appendMessage('ai', data.response);
-                    
-                    // Re-render sessions to update the list and apply the active class
-                    fetchAndRenderSessions(); 
+                    sessionCache.set(currentSessionId, sessionHistory);
+
+                    // Only this session changed: move (or add) it to the top locally instead of refetching the list
+                    invalidateSessionsCache();
+                    renderedSessionsHash = null;
+                    showSessionAtTop(currentSessionId);
+                } else if (response.ok) {
+                    appendMessage('ai', 'The response stream ended unexpectedly. Please try again.');
                 } else {
                     appendMessage('ai', `Error: ${data.error || 'Unknown server error'}`);
                     
@@ -867,36 +1696,73 @@ HTML_CONTENT = """
             }
         }
 
+        // Histories of sessions loaded in this tab, by session ID; kept in step with sends, renames and deletes
+        const sessionCache = new Map();
+
+        function showSession(sessionId, history) {
+            // Move the active class to the selected button
+            setActiveButton(sessionButton(sessionId));
+
+            sessionHistory = history;
+            currentSessionId = sessionId;
+            renderSessionHistory();
+        }
+
+        // Controller of the load in progress; a click on another session aborts it
+        let loadCtl = null;
+        let loadCtlSessionId = null;
+
         async function loadSession(sessionId) {
             if (sendBtn.disabled) return; // Check if inputs are disabled (waiting for response)
             // Close any open menus
-            document.querySelectorAll('.session-menu').forEach(menu => menu.classList.remove('show'));
+            closeOpenMenu();
+
+            // Already loading this session: that request will render it
+            if (loadCtl && loadCtlSessionId === sessionId) return;
+            // Otherwise cancel the slower load so its late response can't overwrite this one
+            if (loadCtl) {
+                loadCtl.abort();
+                loadCtl = loadCtlSessionId = null;
+            }
+
+            // Recently viewed sessions switch without a round-trip
+            const cachedHistory = sessionCache.get(sessionId);
+            if (cachedHistory) {
+                showSession(sessionId, cachedHistory);
+                return;
+            }
+
+            const ctl = loadCtl = new AbortController();
+            loadCtlSessionId = sessionId;
+            const timer = setTimeout(() => ctl.abort(), 10000);
             
             try {
-                const response = await fetch(`/api/load_session/${sessionId}`);
-                const data = await response.json();
-                if (response.ok) {
-                    // Remove active class from all buttons
-                    document.querySelectorAll('#sessions-list .session-button').forEach(btn => {
-                        btn.classList.remove('active');
-                    });
-                    
-                    // Add active class to the selected button
-                    const selectedButton = document.querySelector(`[data-session-id="${sessionId}"]`);
-                    if (selectedButton) {
-                        selectedButton.classList.add('active');
-                    }
-                    
-                    sessionHistory = data.history;
-                    currentSessionId = sessionId;
-                    renderSessionHistory();
+                const { ok, data } = await fetchSessionHistory(sessionId, ctl.signal);
+                if (ok && ctl === loadCtl) {
+                    sessionCache.set(sessionId, data.history);
+                    showSession(sessionId, data.history);
                 }
             } catch (error) {
-                console.error('Error loading session:', error);
+                if (error.name !== 'AbortError') console.error('Error loading session:', error);
+            } finally {
+                clearTimeout(timer);
+                if (ctl === loadCtl) loadCtl = loadCtlSessionId = null;
             }
         }
-        
-        window.loadSession = loadSession; 
+
+
+        // In-flight /api/load_session requests by session ID, so repeated clicks share one fetch
+        const loadInFlight = new Map();
+        function fetchSessionHistory(sessionId, signal) {
+            let pending = loadInFlight.get(sessionId);
+            if (!pending) {
+                pending = fetch(`/api/load_session/${sessionId}`, { signal })
+                    .then(async response => ({ ok: response.ok, data: await response.json() }))
+                    .finally(() => loadInFlight.delete(sessionId));
+                loadInFlight.set(sessionId, pending);
+            }
+            return pending;
+        }
         
         /**
          * Step 1 of rename process: Enables content editable mode on the session title.
@@ -904,9 +1770,9 @@ HTML_CONTENT = """
         function enableRename(oldSessionId) {
             if (sendBtn.disabled) return;
             // Close menu
-            document.querySelectorAll('.session-menu').forEach(menu => menu.classList.remove('show'));
+            closeOpenMenu();
 
-            const button = document.querySelector(`[data-session-id="${oldSessionId}"]`);
+            const button = sessionButton(oldSessionId);
             if (!button) return;
 
             const titleSpan = button.querySelector('.session-title-text');
@@ -915,14 +1781,19 @@ HTML_CONTENT = """
             // 1. Enable editing
             titleSpan.setAttribute('contenteditable', 'true');
             
-            // 2. Select content and focus
-            titleSpan.focus();
-            // Move cursor to end (or select all if needed, selecting all is generally better for renaming)
-            try {
-                document.execCommand('selectAll', false, null);
-            } catch (e) {
-                // Ignore if selectAll fails in restricted environments
-            }
+            // 2. Focus and select the whole title in the next frame, so the browser lays out once
+            requestAnimationFrame(() => {
+                titleSpan.focus();
+                try {
+                    const range = document.createRange();
+                    range.selectNodeContents(titleSpan);
+                    const selection = window.getSelection();
+                    selection.removeAllRanges();
+                    selection.addRange(range);
+                } catch (e) {
+                    // Ignore if selection fails in restricted environments
+                }
+            });
             
             // 3. Set up listeners to finalize rename on blur or Enter
             const finalize = (event) => {
@@ -944,7 +1815,7 @@ HTML_CONTENT = """
 
                     // If name is the same or empty, just revert the UI state and don't call API
                     if (newName === "" || newName === oldSessionId || newName === titleSpan.getAttribute('data-full-name')) {
-                        fetchAndRenderSessions(); // Refresh to original text in case of truncation
+                        fetchAndRenderSessions(true); // Refresh to original text in case of truncation
                         return;
                     }
 
@@ -956,7 +1827,6 @@ HTML_CONTENT = """
             titleSpan.addEventListener('keydown', finalize);
             titleSpan.addEventListener('blur', finalize);
         }
-        window.renameSession = enableRename;
 
 
         /**
@@ -978,16 +1848,22 @@ HTML_CONTENT = """
                     if (currentSessionId === oldSessionId) {
                         currentSessionId = data.new_session_id;
                     }
-                    fetchAndRenderSessions(); // Re-render to show the new, sanitized/unique ID
+                    titleCache.delete(oldSessionId);
+                    if (sessionCache.has(oldSessionId)) {
+                        sessionCache.set(data.new_session_id, sessionCache.get(oldSessionId));
+                        sessionCache.delete(oldSessionId);
+                    }
+                    invalidateSessionsCache();
+                    scheduleFetchSessions(true); // Re-render to show the new, sanitized/unique ID
                 } else {
                     console.error(`Rename failed: ${data.error || 'Unknown error'}`);
                     // Revert the title back to its previous state on failure
-                    fetchAndRenderSessions(); 
+                    scheduleFetchSessions(true);
                 }
             } catch (error) {
                 console.error('Error renaming session:', error);
                 // Revert the title back to its previous state on network error
-                fetchAndRenderSessions(); 
+                scheduleFetchSessions(true);
             }
         }
 
@@ -995,7 +1871,7 @@ HTML_CONTENT = """
         async function deleteSession(sessionId) {
             if (sendBtn.disabled) return;
             // Close menu
-            document.querySelectorAll('.session-menu').forEach(menu => menu.classList.remove('show'));
+            closeOpenMenu();
 
             // NOTE: Using console.log for success/error instead of alert/confirm as per instructions
             
@@ -1005,13 +1881,16 @@ HTML_CONTENT = """
                 });
                 if (response.ok) {
                     console.log(`Session ${sessionId} deleted successfully.`);
+                    titleCache.delete(sessionId);
+                    sessionCache.delete(sessionId);
                     if (currentSessionId === sessionId) {
                         // Reset to a new session if the current one is deleted
                         sessionHistory = [];
                         currentSessionId = null;
                         renderSessionHistory();
                     }
-                    fetchAndRenderSessions(); // Re-render the sessions list
+                    invalidateSessionsCache();
+                    scheduleFetchSessions(); // Re-render the sessions list
                 } else {
                     const data = await response.json();
                     console.error(`Error deleting session: ${data.error}`);
@@ -1020,111 +1899,297 @@ HTML_CONTENT = """
                 console.error('Error deleting session:', error);
             }
         }
-        
-        // Expose function globally
-        window.deleteSession = deleteSession;
-        
-        function toggleSessionMenu(event, sessionId) {
-            event.stopPropagation(); // Stop click from propagating to loadSession
-            
-            const menu = event.currentTarget.nextElementSibling; // The menu is the next sibling
+
+        function toggleSessionMenu(moreOptionsBtn) {
+            const menu = moreOptionsBtn._menu; // Set when the item is built
             
-            // Close all other menus
-            document.querySelectorAll('.session-menu').forEach(m => {
-                if (m !== menu) {
-                    m.classList.remove('show');
-                }
-            });
+            // Close the other open menu, if any
+            if (openMenuEl && openMenuEl !== menu) {
+                openMenuEl.classList.remove('show');
+            }
             
             // Toggle the clicked menu
             menu.classList.toggle('show');
+            openMenuEl = menu.classList.contains('show') ? menu : null;
         }
-        window.toggleSessionMenu = toggleSessionMenu;
 
-        async function fetchAndRenderSessions() {
-            sessionsList.innerHTML = '';
+        // One delegated listener handles every session item, menu button and menu entry
+        sessionsList.addEventListener('click', (event) => {
+            const item = event.target.closest('.session-item');
+            if (!item) return;
+            const sessionId = item.querySelector('.session-button').dataset.sessionId;
+
+            const actionEl = event.target.closest('[data-action]');
+            switch (actionEl && actionEl.dataset.action) {
+                case 'menu': toggleSessionMenu(actionEl); break;
+                case 'rename': enableRename(sessionId); break;
+                case 'delete': deleteSession(sessionId); break;
+                case 'load': loadSession(sessionId); break;
+            }
+        });
+
+        // Prefetch a session's history once the pointer rests on it, so the click renders from sessionCache
+        let hoverTimer = null;
+        let hoverItem = null;
+        sessionsList.addEventListener('mouseover', (event) => {
+            const item = event.target.closest('.session-item');
+            if (!item || item === hoverItem) return;
+            clearTimeout(hoverTimer);
+            hoverItem = item;
+
+            const sessionId = item.querySelector('.session-button').dataset.sessionId;
+            if (sessionId === currentSessionId || sessionCache.has(sessionId) || loadInFlight.has(sessionId)) return;
+            // A quick sweep across the list shouldn't fire a request per item
+            hoverTimer = setTimeout(() => {
+                fetchSessionHistory(sessionId)
+                    .then(({ ok, data }) => {
+                        // Don't overwrite a history that was loaded or extended meanwhile
+                        if (ok && !sessionCache.has(sessionId)) sessionCache.set(sessionId, data.history);
+                    })
+                    .catch(() => {}); // Only speculative; a click retries
+            }, 100);
+        }, { passive: true });
+
+        sessionsList.addEventListener('mouseout', (event) => {
+            if (hoverItem && !hoverItem.contains(event.relatedTarget)) {
+                clearTimeout(hoverTimer);
+                hoverItem = null;
+            }
+        }, { passive: true });
+
+        // Stale-while-revalidate cache of the sessions list, kept in sessionStorage: {hash, sessions}
+        const SESSIONS_CACHE_KEY = 'sessions_cache';
+        // X-Sessions-Hash of the list currently on screen
+        let renderedSessionsHash = null;
+
+        function readSessionsCache() {
             try {
-                const response = await fetch('/api/get_sessions');
-                const data = await response.json();
-                
-                const sessionKeys = response.ok ? data.sessions : []; 
-                
-                // Show most recent sessions first
-                const reversedSessions = sessionKeys.reverse();
+                return JSON.parse(sessionStorage.getItem(SESSIONS_CACHE_KEY));
+            } catch (e) {
+                return null; // Storage disabled or corrupt entry: behave as a cache miss
+            }
+        }
 
-                reversedSessions.forEach(sessionId => {
-                    const sessionItem = document.createElement('div');
-                    sessionItem.classList.add('session-item');
+        function writeSessionsCache(entry) {
+            try {
+                sessionStorage.setItem(SESSIONS_CACHE_KEY, JSON.stringify(entry));
+            } catch (e) {
+                // Quota exceeded or storage disabled; the cache is only an optimisation
+            }
+        }
 
-                    const button = document.createElement('button');
-                    button.classList.add('session-button');
-                    
-                    // --- NEW: Title Span for Inline Editing ---
-                    const titleSpan = document.createElement('span');
-                    titleSpan.classList.add('session-title-text');
-                    
-                    // Format the display text (capitalize first letter, replace hyphens with spaces)
-                    let formattedText = sessionId.charAt(0).toUpperCase() + sessionId.slice(1).replace(/-/g, ' ');
-                    
-                    // Truncate long titles for visual cleanliness
-                    if (formattedText.length > 25) {
-                        formattedText = formattedText.substring(0, 22) + '...';
-                    }
-                    titleSpan.textContent = formattedText;
-                    titleSpan.setAttribute('data-full-name', sessionId);
-                    // ----------------------------------------
+        // Bumped on every invalidation; a fetch that resolves after one carries the old list and is discarded
+        let sessionsGeneration = 0;
 
-                    button.setAttribute('data-session-id', sessionId); 
-                    button.onclick = () => loadSession(sessionId);
-                    
-                    // Set active class if it's the current session
-                    if (sessionId === currentSessionId) {
-                        button.classList.add('active');
-                    }
+        function invalidateSessionsCache() {
+            // A fetch started before the change would bring back the old list
+            sessionsGeneration++;
+            sessionsInFlight = null;
+            try {
+                sessionStorage.removeItem(SESSIONS_CACHE_KEY);
+            } catch (e) {}
+        }
 
-                    // --- NEW: More Options Button (Ellipsis) ---
-                    const moreOptionsBtn = document.createElement('button');
-                    moreOptionsBtn.classList.add('more-options-btn');
-                    moreOptionsBtn.innerHTML = `
-                        <svg xmlns="http://www.w3.org/2000/svg" width="20" height="20" viewBox="0 0 24 24" fill="none" stroke="currentColor" stroke-width="2" stroke-linecap="round" stroke-linejoin="round">
-                            <circle cx="12" cy="12" r="1"></circle>
-                            <circle cx="19" cy="12" r="1"></circle>
-                            <circle cx="5" cy="12" r="1"></circle>
-                        </svg>
-                    `;
-                    // Pass the event and sessionId to the new toggle function
-                    moreOptionsBtn.onclick = (event) => toggleSessionMenu(event, sessionId);
-
-                    // --- NEW: Session Menu (Dropdown) ---
-                    const sessionMenu = document.createElement('ul');
-                    sessionMenu.classList.add('session-menu');
-                    
-                    // IMPORTANT: The rename function now calls enableRename (exposed as window.renameSession)
-                    sessionMenu.innerHTML = `
-                        <li class="session-menu-item" onclick="renameSession('${sessionId}')">
-                            <svg xmlns="http://www.w3.org/2000/svg" width="18" height="18" viewBox="0 0 24 24" fill="none" stroke="currentColor" stroke-width="2" stroke-linecap="round" stroke-linejoin="round"><path d="M12 20h9"/><path d="M16.5 3.5a2.121 2.121 0 0 1 3 3L7 19l-4 1 1-4L16.5 3.5z"/></svg>
-                            <span>Rename</span>
-                        </li>
-                        <li class="session-menu-item delete-option" onclick="deleteSession('${sessionId}')">
-                            <svg xmlns="http://www.w3.org/2000/svg" width="18" height="18" viewBox="0 0 24 24" fill="none" stroke="currentColor" stroke-width="2" stroke-linecap="round" stroke-linejoin="round">
-                                <polyline points="3 6 5 6 21 6"></polyline>
-                                <path d="M19 6v14a2 2 0 0 1-2 2H7a2 2 0 0 1-2-2V6m3 0V4a2 2 0 0 1 2-2h4a2 2 0 0 1 2 2v2"></path>
-                            </svg>
-                            <span>Delete</span>
-                        </li>
-                    `;
-
-                    button.appendChild(titleSpan); // Append the title span to the button
-                    sessionItem.appendChild(button);
-                    sessionItem.appendChild(moreOptionsBtn); // Add the ellipsis button
-                    sessionItem.appendChild(sessionMenu); // Add the menu
-                    sessionsList.appendChild(sessionItem);
-                });
+        // Shared /api/get_sessions request; concurrent callers reuse it until it settles
+        let sessionsInFlight = null;
+        function fetchSessions() {
+            if (!sessionsInFlight) {
+                const pending = fetch('/api/get_sessions')
+                    .then(async response => ({
+                        ok: response.ok,
+                        hash: response.headers.get('X-Sessions-Hash'),
+                        data: await response.json(),
+                    }))
+                    .finally(() => {
+                        if (sessionsInFlight === pending) sessionsInFlight = null;
+                    });
+                sessionsInFlight = pending;
+            }
+            return sessionsInFlight;
+        }
+
+        /**
+         * Renders the sessions list from cache, then from the server if it changed.
+         * forceRender rebuilds the DOM even if the list is unchanged (e.g. to undo an inline edit).
+         */
+        async function fetchAndRenderSessions(forceRender = false) {
+            if (forceRender) renderedSessionsHash = null;
+
+            // Paint the cached list right away, then revalidate it against the server
+            const cached = readSessionsCache();
+            if (cached && cached.hash !== renderedSessionsHash) {
+                renderSessions(cached.sessions);
+                renderedSessionsHash = cached.hash;
+            }
+
+            try {
+                const generation = sessionsGeneration;
+                const { ok, hash, data } = await fetchSessions();
+                if (!ok || generation !== sessionsGeneration) return;
+
+                // Only rebuild the DOM if the list actually changed
+                if (hash && hash === renderedSessionsHash) return;
+
+                renderSessions(data.sessions);
+                renderedSessionsHash = hash;
+                writeSessionsCache({ hash: hash, sessions: data.sessions });
             } catch (error) {
                 console.error('Error fetching sessions:', error);
             }
         }
 
+        // Trailing-edge debounce: a burst of renames/deletes coalesces into one fetch + one render
+        let fetchTimer = null;
+        let pendingForceRender = false;
+        function scheduleFetchSessions(forceRender = false) {
+            pendingForceRender = pendingForceRender || forceRender;
+            clearTimeout(fetchTimer);
+            fetchTimer = setTimeout(() => {
+                const force = pendingForceRender;
+                pendingForceRender = false;
+                fetchAndRenderSessions(force);
+            }, 150);
+        }
+
+        // Display titles by session ID; an ID's title never changes, so entries only go when the ID does
+        const titleCache = new Map();
+        function formatSessionTitle(sessionId) {
+            let title = titleCache.get(sessionId);
+            if (title) return title;
+
+            // Format the display text (capitalize first letter, replace hyphens with spaces)
+            title = sessionId.charAt(0).toUpperCase() + sessionId.slice(1).replace(/-/g, ' ');
+            // Truncate long titles for visual cleanliness
+            if (title.length > 25) {
+                title = title.substring(0, 22) + '...';
+            }
+            titleCache.set(sessionId, title);
+            return title;
+        }
+
+        // Rendered session items by session ID, so re-renders only touch what changed
+        const itemIndex = new Map();
+
+        function createSessionItem(sessionId) {
+            const sessionItem = document.createElement('div');
+            sessionItem.classList.add('session-item');
+
+            const button = document.createElement('button');
+            button.classList.add('session-button');
+            
+            // --- NEW: Title Span for Inline Editing ---
+            const titleSpan = document.createElement('span');
+            titleSpan.classList.add('session-title-text');
+            titleSpan.textContent = formatSessionTitle(sessionId);
+            titleSpan.setAttribute('data-full-name', sessionId);
+            // ----------------------------------------
+
+            button.setAttribute('data-session-id', sessionId); 
+            button.dataset.action = 'load';
+
+            // --- NEW: More Options Button (Ellipsis) ---
+            const moreOptionsBtn = document.createElement('button');
+            moreOptionsBtn.classList.add('more-options-btn');
+            moreOptionsBtn.appendChild(ellipsisTpl.cloneNode(true));
+            moreOptionsBtn.dataset.action = 'menu';
+
+            // --- NEW: Session Menu (Dropdown) ---
+            const sessionMenu = document.createElement('ul');
+            sessionMenu.classList.add('session-menu');
+            
+            // Clicks are handled by the delegated listener on sessionsList via data-action
+            sessionMenu.appendChild(renameTpl.cloneNode(true));
+            sessionMenu.appendChild(deleteTpl.cloneNode(true));
+            moreOptionsBtn._menu = sessionMenu;
+
+            button.appendChild(titleSpan); // Append the title span to the button
+            sessionItem.appendChild(button);
+            sessionItem.appendChild(moreOptionsBtn); // Add the ellipsis button
+            sessionItem.appendChild(sessionMenu); // Add the menu
+            return sessionItem;
+        }
+
+        // Direct lookup instead of a selector scan over every session button
+        function sessionButton(sessionId) {
+            const item = itemIndex.get(sessionId);
+            return item ? item.firstChild : null;
+        }
+
+        // Moves a session's sidebar item and cached data to its new ID instead of adding a second item
+        function renameSessionLocally(oldSessionId, newSessionId) {
+            titleCache.delete(oldSessionId);
+            if (sessionCache.has(oldSessionId)) {
+                sessionCache.set(newSessionId, sessionCache.get(oldSessionId));
+                sessionCache.delete(oldSessionId);
+            }
+
+            const item = itemIndex.get(oldSessionId);
+            if (!item) return;
+            itemIndex.delete(oldSessionId);
+            if (itemIndex.has(newSessionId)) {
+                // The list already shows the new ID (e.g. it was refetched meanwhile)
+                item.remove();
+                return;
+            }
+            const button = item.firstChild;
+            const titleSpan = button.querySelector('.session-title-text');
+            button.setAttribute('data-session-id', newSessionId);
+            titleSpan.setAttribute('data-full-name', newSessionId);
+            titleSpan.textContent = formatSessionTitle(newSessionId);
+            itemIndex.set(newSessionId, item);
+        }
+
+        // The session just written to is the most recent one, so it goes first
+        function showSessionAtTop(sessionId) {
+            let item = itemIndex.get(sessionId);
+            if (!item) {
+                item = createSessionItem(sessionId);
+                itemIndex.set(sessionId, item);
+            }
+            if (sessionsList.firstChild !== item) {
+                sessionsList.insertBefore(item, sessionsList.firstChild);
+            }
+            setActiveButton(sessionButton(sessionId));
+        }
+
+        function renderSessions(sessionKeys) {
+            closeOpenMenu();
+
+            // Drop the items of sessions that no longer exist
+            const keep = new Set(sessionKeys);
+            itemIndex.forEach((item, sessionId) => {
+                if (!keep.has(sessionId)) {
+                    item.remove();
+                    itemIndex.delete(sessionId);
+                }
+            });
+
+            // Walk the list most recent first, reusing existing items and only moving those out of place
+            let cursor = sessionsList.firstChild;
+            for (let i = sessionKeys.length - 1; i >= 0; i--) {
+                const sessionId = sessionKeys[i];
+                let item = itemIndex.get(sessionId);
+                if (!item) {
+                    item = createSessionItem(sessionId);
+                    itemIndex.set(sessionId, item);
+                }
+
+                // Reset the title if needed, undoing an abandoned inline edit
+                const titleSpan = item.querySelector('.session-title-text');
+                const title = formatSessionTitle(sessionId);
+                if (titleSpan.textContent !== title) titleSpan.textContent = title;
+
+                if (item === cursor) {
+                    cursor = cursor.nextSibling;
+                } else {
+                    sessionsList.insertBefore(item, cursor);
+                }
+            }
+
+            // Set active class on the current session, if it is listed
+            setActiveButton(sessionButton(currentSessionId));
+        }
+
         sendBtn.addEventListener('click', sendMessage);
         userInput.addEventListener('keydown', (event) => {
             if (event.key === 'Enter') {
@@ -1136,12 +2201,10 @@ HTML_CONTENT = """
             sessionHistory = [];
             currentSessionId = null;
             renderSessionHistory();
-            // Remove active class from all buttons
-            document.querySelectorAll('#sessions-list .session-button').forEach(btn => {
-                btn.classList.remove('active');
-            });
-             // Close any open menus
-            document.querySelectorAll('.session-menu').forEach(menu => menu.classList.remove('show'));
+            // Remove active class from the previously selected button
+            setActiveButton(null);
+            // Close any open menus
+            closeOpenMenu();
         });
 
         // Initial load
@@ -1152,6 +2215,52 @@ HTML_CONTENT = """
 </html>
 """
 
+def minify_html(html):
+    """Strips indentation, blank lines and comment-only lines/blocks from HTML_CONTENT."""
+    # CSS comments only appear inside <style>; JS regex literals elsewhere contain "/*"-like text
+    head, style_end, rest = html.partition('</style>')
+    head = _CSS_COMMENT_RE.sub('', head)
+    lines = (line.strip() for line in (head + style_end + rest).splitlines())
+    # Newlines are kept so JavaScript's automatic semicolon insertion still works
+    minified = "\n".join(line for line in lines if line and not line.startswith('//'))
+    return _BLOCK_COMMENT_RE.sub('', minified)
+
+# Matches /* CSS comments */ within the <style> block
+_CSS_COMMENT_RE = re.compile(r'/\*.*?\*/', re.S)
+# Matches <!-- HTML comments --> and /** JS doc comments */ that start on their own line
+_BLOCK_COMMENT_RE = re.compile(r'<!--.*?-->\n?|^/\*\*$.*?^\*/$\n?', re.S | re.M)
+
+def split_assets(html):
+    """Moves the page's inline <style> and <script> into content-hashed assets.
+
+    Returns the slimmed page and {filename: (body, mimetype)}.
+    """
+    assets = {}
+
+    def add_asset(body, extension, mimetype):
+        body = body.encode('utf-8')
+        name = f"app.{hashlib.sha1(body).hexdigest()[:12]}.{extension}"
+        assets[name] = (body, mimetype)
+        return f"/assets/{name}"
+
+    html = _STYLE_RE.sub(lambda m: f'<link rel="stylesheet" href="{add_asset(m.group(1), "css", "text/css")}">', html, count=1)
+    # defer keeps the old end-of-body timing: the script runs once the document is parsed
+    html = _SCRIPT_RE.sub(lambda m: f'<script src="{add_asset(m.group(1), "js", "text/javascript")}" defer></script>', html, count=1)
+    return html, assets
+
+# The inline <style> block and the app's <script> block (not ones with attributes)
+_STYLE_RE = re.compile(r'<style>\n?(.*?)</style>', re.S)
+_SCRIPT_RE = re.compile(r'<script>\n?(.*?)</script>', re.S)
+
+# The page is static: minify it, split out the CSS/JS so browsers cache them across page loads,
+# then encode and compress everything once at import and fingerprint it for browser revalidation
+_home_html, _asset_bodies = split_assets(minify_html(HTML_CONTENT))
+_HOME_HTML = _home_html.encode('utf-8')
+_HOME = precompress(_HOME_HTML)
+_HOME_ETAG = hashlib.md5(_HOME_HTML).hexdigest()
+# {filename: (variants, mimetype, etag)}; the filename hash doubles as the ETag
+_ASSETS = {name: (precompress(body), mimetype, name.split('.')[1]) for name, (body, mimetype) in _asset_bodies.items()}
+
 if __name__ == '__main__':
-    # Flask will automatically use the PORT env var if available, otherwise 5000
+    # Development server only; in production run `gunicorn -c gunicorn.conf.py NeuraX:app`
     app.run(debug=True)
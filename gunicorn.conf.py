@@ -0,0 +1,22 @@
+# Production server settings for NeuraX.
+# Run with: gunicorn -c gunicorn.conf.py NeuraX:app
+# (`python NeuraX.py` still starts the Flask development server.)
+import os
+
+bind = f"0.0.0.0:{os.getenv('PORT', '5000')}"
+
+# gevent workers: the OpenAI call is network-bound, so each worker can keep many chats in
+# flight at once. gunicorn monkey-patches the worker itself, so NeuraX.py needs no gevent import.
+worker_class = "gevent"
+# Chat sessions live in process memory, so a single worker keeps every request on the same
+# store; concurrency comes from worker_connections. Only raise this with sticky sessions.
+workers = int(os.getenv("WEB_CONCURRENCY", "1"))
+# NeuraX.py sizes its OpenAI connection pool from the same variable
+worker_connections = int(os.getenv("WORKER_CONNECTIONS", "200"))
+
+# OpenAI replies can take a while; don't let the arbiter kill slow but healthy workers
+timeout = 120
+
+# Keep idle client connections open between requests (gunicorn's default is 2s), so the page's
+# follow-up API calls reuse the TCP/TLS connection instead of reconnecting
+keepalive = int(os.getenv("KEEPALIVE", "5"))